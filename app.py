@@ -1,8 +1,30 @@
+import atexit
+
+import logging
+
 import os
 
+import queue
+
+import threading
+
+import time
+
+from dataclasses import dataclass
+
+import orjson
+
 import requests
 
-from flask import Flask, request, jsonify
+from requests.adapters import HTTPAdapter, Retry
+
+from flask import Flask, request
+
+
+
+logging.basicConfig(level=logging.INFO)
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -12,79 +34,281 @@ app = Flask(__name__)
 
 
 
-# Get the Discord Webhook URL from the environment variable
+# Settings read once from the environment at startup
 
-DISCORD_WEBHOOK_URL = os.environ.get('DISCORD_WEBHOOK_URL')
+@dataclass(frozen=True, slots=True)
 
+class Config:
 
+    webhook_url: str
 
-@app.route('/')
 
-def home():
 
-    """A simple homepage to show the service is running."""
+    def __post_init__(self):
 
-    return "Webhook server is alive!", 200
+        if not self.webhook_url:
 
+            raise RuntimeError("Discord webhook URL is not configured. Set the DISCORD_WEBHOOK_URL environment variable.")
 
 
-@app.route('/send')
 
-def send_message():
+# Raises KeyError at startup if DISCORD_WEBHOOK_URL is unset, RuntimeError if it is empty
+
+CFG = Config(webhook_url=os.environ['DISCORD_WEBHOOK_URL'])
+
+
+
+# Reuse one session so the TCP/TLS connection to Discord stays open between requests
+
+session = requests.Session()
+
+# Longest we'll sleep on a Retry-After header; every queued message waits behind the one sender thread
+
+MAX_RETRY_AFTER_SECONDS = 5
+
+
+
+class CappedRetry(Retry):
+
+    """Retry policy that clamps Retry-After waits to MAX_RETRY_AFTER_SECONDS."""
+
+    def get_retry_after(self, response):
+
+        retry_after = super().get_retry_after(response)
+
+        if retry_after is None:
+
+            return None
+
+        return min(retry_after, MAX_RETRY_AFTER_SECONDS)
+
+
+
+# Retry transient Discord failures and rate limits, honouring (capped) Retry-After headers
+
+retry = CappedRetry(
+
+    total=3,
+
+    backoff_factor=0.2,
+
+    status_forcelist=(429, 500, 502, 503, 504),
+
+    allowed_methods=frozenset({"POST"}),
+
+    respect_retry_after_header=True,
+
+)
+
+adapter = HTTPAdapter(max_retries=retry)
+
+session.mount('https://', adapter)
+
+# (connect, read) timeouts so a stalled Discord or DNS lookup can't hang the sender
+
+DISCORD_TIMEOUT = (2, 5)
+
+DISCORD_HEADERS = {"Content-Type": "application/json"}
+
+
+
+# Messages are queued by /send and posted to Discord in batches by a background thread
+
+MAX_BATCH_SIZE = 10
+
+BATCH_WINDOW_SECONDS = 0.2
+
+DISCORD_MAX_CONTENT_LENGTH = 2000
+
+# How long a worker waits at exit for queued messages to be sent (kept under gunicorn's graceful timeout)
+
+SHUTDOWN_FLUSH_SECONDS = 10
+
+# Cap the backlog so a fast client or a stalled Discord can't grow worker memory without limit
+
+MAX_QUEUED_MESSAGES = 500
+
+message_queue = queue.Queue(maxsize=MAX_QUEUED_MESSAGES)
+
+
+
+def post_to_discord(content):
+
+    """Send a single webhook payload to Discord."""
+
+    discord_payload = orjson.dumps({"content": content})
+
+    try:
+
+        response = session.post(CFG.webhook_url, data=discord_payload, headers=DISCORD_HEADERS, timeout=DISCORD_TIMEOUT)
+
+        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
 
-    """
+    except requests.exceptions.RequestException as e:
 
-    This endpoint sends a message to Discord.
+        logger.error("Error sending message to Discord: %s", e)
 
-    Usage: /send?message=Your message here
 
-    """
 
-    # Get the message from the URL query parameter
+def flush_messages():
 
-    message_text = request.args.get('message')
+    """Collect queued messages for a short window and post them together."""
 
+    while True:
 
+        # Block until there is something to send, then gather whatever arrives shortly after
+
+        batch = [message_queue.get()]
+
+        try:
+
+            deadline = time.monotonic() + BATCH_WINDOW_SECONDS
+
+            while len(batch) < MAX_BATCH_SIZE:
+
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+
+                    break
+
+                try:
+
+                    batch.append(message_queue.get(timeout=remaining))
+
+                except queue.Empty:
+
+                    break
+
+
+
+            # Join the batch with newlines, starting a new post whenever Discord's limit would be exceeded
+
+            content = ""
+
+            for message_text in batch:
+
+                if content and len(content) + 1 + len(message_text) > DISCORD_MAX_CONTENT_LENGTH:
+
+                    post_to_discord(content)
+
+                    content = message_text
+
+                else:
+
+                    content = f"{content}\n{message_text}" if content else message_text
+
+            post_to_discord(content)
+
+        except Exception:
+
+            # Keep the sender alive so one bad batch doesn't stop all later deliveries
+
+            logger.exception("Webhook sender failed")
+
+        finally:
+
+            # Mark every message in the batch as handled so shutdown knows when the queue is empty
+
+            for _ in batch:
+
+                message_queue.task_done()
+
+
+
+def wait_for_queued_messages():
+
+    """Give the sender a bounded amount of time to deliver queued messages before the process exits."""
+
+    deadline = time.monotonic() + SHUTDOWN_FLUSH_SECONDS
+
+    with message_queue.all_tasks_done:
+
+        if message_queue.unfinished_tasks:
+
+            logger.info("Waiting for %d queued message(s) to be sent before exit", message_queue.unfinished_tasks)
+
+        while message_queue.unfinished_tasks:
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+
+                logger.error("Dropping %d queued message(s) that were not sent before exit", message_queue.unfinished_tasks)
+
+                return
+
+            message_queue.all_tasks_done.wait(remaining)
+
+
+
+threading.Thread(target=flush_messages, daemon=True).start()
+
+atexit.register(wait_for_queued_messages)
+
+
+
+def json_response(obj, status=200):
+
+    """Build a JSON response using orjson instead of Flask's jsonify."""
+
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+
+@app.route('/')
+
+def home():
+
+    """A simple homepage to show the service is running."""
+
+    return "Webhook server is alive!", 200
+
+
+
+@app.route('/send')
+
+def send_message():
 
-    # Make sure a message was provided and the webhook URL is set
+    """
 
-    if not DISCORD_WEBHOOK_URL:
+    This endpoint queues a message to be sent to Discord.
 
-        return jsonify({"error": "Discord webhook URL is not configured."}), 500
+    Usage: /send?message=Your message here
 
+    """
 
+    # Get the message from the URL query parameter
 
-    if not message_text:
+    message_text = request.args.get('message')
 
-        return jsonify({"error": "Please provide a 'message' query parameter."}), 400
 
 
+    # Make sure a message was provided (Discord rejects whitespace-only content)
 
-    # This is the data payload Discord expects
+    if not message_text or not message_text.strip():
 
-    discord_payload = {
+        return json_response({"error": "Please provide a 'message' query parameter."}, 400)
 
-        "content": message_text
 
-    }
 
+    if len(message_text) > DISCORD_MAX_CONTENT_LENGTH:
 
+        return json_response({"error": f"Message must be at most {DISCORD_MAX_CONTENT_LENGTH} characters."}, 400)
 
-    # Send the POST request to the Discord webhook URL
 
-    try:
 
-        response = requests.post(DISCORD_WEBHOOK_URL, json=discord_payload)
+    # Hand the message to the background sender and return right away
 
-        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+    try:
 
-        return jsonify({"success": f"Message sent: '{message_text}'"}), 200
+        message_queue.put_nowait(message_text)
 
-    except requests.exceptions.RequestException as e:
+    except queue.Full:
 
-        print(f"Error sending message to Discord: {e}")
+        return json_response({"error": "Too many messages are waiting to be sent. Try again later."}, 503)
 
-        return jsonify({"error": "Failed to send message to Discord."}), 500
+    return json_response({"queued": True}, 202)
 
 
 
@@ -92,4 +316,4 @@ def send_message():
 
 if __name__ == '__main__':
 
-    app.run(host='0.0.0.0', port=5000)
+    app.run(host='0.0.0.0', port=5000)